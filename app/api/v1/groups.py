@@ -1,19 +1,30 @@
-from typing import Any
+import operator
+from collections.abc import AsyncGenerator
 from enum import Enum
 
+import orjson
 from fastapi import APIRouter, Depends, Query, HTTPException, Path
-from fastcrud.paginated import PaginatedListResponse, compute_offset, paginated_response
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload, with_polymorphic
-
-from infrastructure.db import get_session
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import Integer, bindparam, delete, func, select, update
+
+from infrastructure.cache import cache, invalidate
+from infrastructure.db import (
+    exists_by_id,
+    get_readonly_session,
+    get_readonly_session_maker,
+    get_session,
+)
+from infrastructure.pagination import MAX_ITEMS_PER_PAGE, build_page, get_sort_column, paginate
+from infrastructure.schemas.pagination import CursorPaginatedListResponse
 from infrastructure.schemas.group import GroupRead, GroupBase
-from infrastructure.schemas.site import SiteRead
+from infrastructure.schemas.site import SiteWithGroups
 from infrastructure.crud.crud_groups import group_crud
 from infrastructure.models.group import Group, GroupType
 from infrastructure.models.site import Site, SiteFrance, SiteItaly
 from infrastructure.models.associations import site_group
+from infrastructure.validators import validate_group_parent
 
 router = APIRouter()
 
@@ -23,12 +34,29 @@ class SortOrder(str, Enum):
     desc = "desc"
 
 
-@router.get("/", response_model=PaginatedListResponse[GroupRead])
+# (query parameter, column, operator), in the order of `read_groups` filter parameters
+GROUP_FILTERS = (("name", Group.name, operator.eq), ("type", Group.type, operator.eq))
+
+# columns accepted by `sort_by`, each backed by a `(column, id)` index
+GROUP_SORTABLE = ("id", "name")
+
+# first page of the unfiltered, unsorted listing (the most requested one)
+FIRST_PAGE_GROUPS = (
+    select(Group, func.count().over().label("total_count"))
+    .order_by(Group.id)
+    .limit(bindparam("limit", type_=Integer))
+)
+
+
+@router.get("/", response_model=CursorPaginatedListResponse[GroupRead])
+@cache(
+    ttl="15s", key="groups:{page}:{cursor}:{items_per_page}:{name}:{type}:{sort_by}:{sort_order}"
+)
 async def read_groups(
-    db: AsyncSession = Depends(get_session),
-    page: int = 1,
-    items_per_page: int = 10,
-    limit: int = 100,
+    db: AsyncSession = Depends(get_readonly_session),
+    page: int = Query(1, deprecated=True, description="Use `cursor` instead"),
+    cursor: str | None = Query(None, description="Cursor returned as `next_cursor`"),
+    items_per_page: int = Query(10, ge=1, le=MAX_ITEMS_PER_PAGE),
     name: str | None = None,
     type: GroupType | None = None,
     sort_by: str | None = Query(None, description="Field to sort by"),
@@ -37,33 +65,48 @@ async def read_groups(
     """
     Get all groups with filtering and sorting options.
     """
-    filters = {}
-
-    if name is not None:
-        filters["name"] = name
-
-    if type is not None:
-        filters["type"] = type
+    groups = Group.__table__
+
+    if page == 1 and cursor is None and name is None and type is None and sort_by is None:
+        result = await db.execute(FIRST_PAGE_GROUPS, {"limit": items_per_page + 1})
+        rows = result.all()
+        groups_data = build_page(
+            [row.Group for row in rows],
+            rows[0].total_count if rows else 0,
+            id_column=groups.c.id,
+            items_per_page=items_per_page,
+        )
+        return CursorPaginatedListResponse[GroupRead].model_validate(
+            groups_data, from_attributes=True
+        )
 
-    groups_data = await group_crud.get_multi(
-        db=db,
-        offset=compute_offset(page, items_per_page),
-        limit=items_per_page,
-        sort_columns=[sort_by] if sort_by else [],
-        sort_orders=[sort_order] if sort_by else [],
-        **filters
+    sort_column = get_sort_column(groups, sort_by, GROUP_SORTABLE)
+    query = select(Group).where(
+        *[
+            op(column, value)
+            for (_, column, op), value in zip(GROUP_FILTERS, (name, type), strict=True)
+            if value is not None
+        ]
     )
 
-    response: dict[str, Any] = paginated_response(
-        crud_data=groups_data, page=page, items_per_page=items_per_page
+    groups_data = await paginate(
+        db,
+        query,
+        id_column=groups.c.id,
+        sort_column=sort_column,
+        descending=sort_by is not None and sort_order == SortOrder.desc,
+        cursor=cursor,
+        page=page,
+        items_per_page=items_per_page,
     )
-    return response
+    return CursorPaginatedListResponse[GroupRead].model_validate(groups_data, from_attributes=True)
 
 
 @router.get("/{group_id}", response_model=GroupRead)
+@cache(ttl="60s", key="group:{group_id}")
 async def read_group(
     group_id: int = Path(..., title="The ID of the group to get"),
-    db: AsyncSession = Depends(get_session),
+    db: AsyncSession = Depends(get_readonly_session),
 ) -> Group:
     """
     Get a specific group by ID.
@@ -77,65 +120,111 @@ async def read_group(
 @router.get("/{group_id}/children", response_model=list[GroupRead])
 async def read_group_children(
     group_id: int = Path(..., title="The ID of the group to get children for"),
-    db: AsyncSession = Depends(get_session),
+    db: AsyncSession = Depends(get_readonly_session),
 ) -> list[Group]:
     """
     Get all children of a specific group.
     """
-    group = await db.get(Group, group_id)
-    if not group:
+    if not await exists_by_id(db, Group, group_id):
         raise HTTPException(status_code=404, detail="Group not found")
 
     children = await db.execute(select(Group).where(Group.parent_id == group_id))
     return children.scalars().all()
 
 
-@router.get("/{group_id}/sites", response_model=list[SiteRead])
+@router.get("/{group_id}/sites", response_model=list[SiteWithGroups])
 async def read_group_sites(
     group_id: int = Path(..., title="The ID of the group to get sites for"),
-    db: AsyncSession = Depends(get_session),
-) -> list[dict]:
+    session_maker: async_sessionmaker[AsyncSession] = Depends(get_readonly_session_maker),
+) -> StreamingResponse:
     """
     Get all sites of a specific group.
+    Sites are streamed as a JSON array while rows are read from the database.
     """
-    result_group = await db.execute(select(Group).where(Group.id == group_id))
-    group = result_group.scalar_one_or_none()
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-
-    PolymorphicSite = with_polymorphic(Site, [SiteFrance, SiteItaly])
+    sites = Site.__table__
+    target = Group.__table__.alias("target")
+    membership = site_group.alias("membership")
+
+    # starting from the requested group, a single statement both checks that it exists and
+    # reads its sites: an empty group yields one row without site, a missing group no row
+    query = (
+        select(
+            *sites.c,
+            SiteFrance.useful_energy_at_1_megawatt,
+            SiteItaly.efficiency,
+            Group.id.label("group_id"),
+            Group.name.label("group_name"),
+            Group.type.label("group_type"),
+            Group.parent_id.label("group_parent_id"),
+        )
+        .select_from(target)
+        .outerjoin(membership, membership.c.group_id == target.c.id)
+        .outerjoin(sites, sites.c.id == membership.c.site_id)
+        .outerjoin(SiteFrance.__table__, SiteFrance.id == sites.c.id)
+        .outerjoin(SiteItaly.__table__, SiteItaly.id == sites.c.id)
+        .outerjoin(site_group, site_group.c.site_id == sites.c.id)
+        .outerjoin(Group, Group.id == site_group.c.group_id)
+        .where(target.c.id == group_id)
+        .order_by(sites.c.id, Group.id)
+    )
 
-    result = await db.execute(
-        select(PolymorphicSite)
-        .options(selectinload(PolymorphicSite.groups))
-        .join(site_group, site_group.c.site_id == PolymorphicSite.id)
-        .where(site_group.c.group_id == group_id)
+    # the session outlives the request, since the response is sent after the endpoint returns
+    session = session_maker()
+    try:
+        result = await session.stream(query)
+        first_row = await result.fetchone()
+        if first_row is None:
+            raise HTTPException(status_code=404, detail="Group not found")
+    except BaseException:
+        await session.close()
+        raise
+
+    async def rows() -> AsyncGenerator:
+        yield first_row
+        async for row in result:
+            yield row
+
+    async def stream_sites() -> AsyncGenerator[bytes, None]:
+        try:
+            yield b"["
+            site_dict = None
+            async for row in rows():
+                if row.id is None:
+                    continue
+                if site_dict is None or site_dict["id"] != row.id:
+                    if site_dict is not None:
+                        yield orjson.dumps(site_dict) + b","
+                    site_dict = {
+                        "id": row.id,
+                        "name": row.name,
+                        "installation_date": row.installation_date,
+                        "max_power_megawatt": row.max_power_megawatt,
+                        "min_power_megawatt": row.min_power_megawatt,
+                        "country": row.country,
+                        "useful_energy_at_1_megawatt": row.useful_energy_at_1_megawatt,
+                        "efficiency": row.efficiency,
+                        "groups": [],
+                    }
+                site_dict["groups"].append(
+                    {
+                        "name": row.group_name,
+                        "type": row.group_type,
+                        "parent_id": row.group_parent_id,
+                        "id": row.group_id,
+                    }
+                )
+            if site_dict is not None:
+                yield orjson.dumps(site_dict)
+            yield b"]"
+        finally:
+            # release the connection as soon as the last row is sent
+            await session.close()
+
+    # the body may never be iterated, e.g. if the client disconnects before the first chunk:
+    # the background task closes the session in any case once the response is over
+    return StreamingResponse(
+        stream_sites(), media_type="application/json", background=BackgroundTask(session.close)
     )
-    
-    sites = result.unique().scalars().all()
-
-    site_dicts = []
-    for site in sites:
-        site_dict = {
-            "id": site.id,
-            "name": site.name,
-            "installation_date": site.installation_date,
-            "max_power_megawatt": site.max_power_megawatt,
-            "min_power_megawatt": site.min_power_megawatt,
-            "country": site.country,
-            "groups": [{"id": g.id, "name": g.name, "type": g.type} for g in site.groups],
-            "efficiency": None,
-            "useful_energy_at_1_megawatt": None,
-        }
-
-        if isinstance(site, SiteFrance):
-            site_dict["useful_energy_at_1_megawatt"] = site.useful_energy_at_1_megawatt
-        elif isinstance(site, SiteItaly):
-            site_dict["efficiency"] = site.efficiency
-        
-        site_dicts.append(site_dict)
-    
-    return site_dicts
 
 
 @router.post("/", response_model=GroupRead, status_code=201)
@@ -144,7 +233,9 @@ async def create_group(group: GroupBase, db: AsyncSession = Depends(get_session)
     Create a new group.
     """
     # TODO verify group creation rules
-    return await group_crud.create(db=db, object=group)
+    created_group = await group_crud.create(db=db, object=group)
+    await invalidate("groups")
+    return created_group
 
 
 @router.patch("/{group_id}", response_model=GroupRead)
@@ -156,13 +247,28 @@ async def update_group(
     """
     Update a group.
     """
-    group = await group_crud.get(db=db, id=group_id)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
+    parent_id = group_update.parent_id
+    if parent_id is not None:
+        if parent_id == group_id:
+            raise HTTPException(status_code=422, detail="A group cannot be its own child")
+
+        if not await validate_group_parent(db, parent_id, group_id):
+            raise HTTPException(
+                status_code=422,
+                detail="Creating this relationship would introduce a cycle in the hierarchy",
+            )
 
-    updated_group = await group_crud.update(
-        db=db, object=group_update, id=group_id, return_as_model=True, schema_to_select=GroupRead
+    updated_group = await db.scalar(
+        update(Group)
+        .where(Group.id == group_id)
+        .values(**group_update.model_dump(exclude_unset=True))
+        .returning(Group)
     )
+    if not updated_group:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    await db.commit()
+    await invalidate("group", "groups", "site", "sites")
     return updated_group
 
 
@@ -174,11 +280,12 @@ async def delete_group(
     """
     Delete a group.
     """
-    group = await group_crud.get(db=db, id=group_id)
-    if not group:
+    result = await db.execute(delete(Group).where(Group.id == group_id))
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Group not found")
 
-    await group_crud.delete(db=db, id=group_id)
+    await db.commit()
+    await invalidate("group", "groups", "site", "sites")
     return {"message": "Group deleted successfully"}
 
 
@@ -191,28 +298,24 @@ async def add_child_to_group(
     """
     Add a child group to a parent group.
     """
-    parent = await db.get(Group, parent_id)
-    if not parent:
+    if not await exists_by_id(db, Group, parent_id):
         raise HTTPException(status_code=404, detail="Parent group not found")
 
-    child = await db.get(Group, child_id)
-    if not child:
+    if not await exists_by_id(db, Group, child_id):
         raise HTTPException(status_code=404, detail="Child group not found")
 
     if parent_id == child_id:
         raise HTTPException(status_code=422, detail="A group cannot be its own child")
 
-    current = parent
-    while current and current.parent_id:
-        if current.parent_id == child_id:
-            raise HTTPException(
-                status_code=422,
-                detail="Creating this relationship would introduce a cycle in the hierarchy",
-            )
-        current = await db.get(Group, current.parent_id)
+    if not await validate_group_parent(db, parent_id, child_id):
+        raise HTTPException(
+            status_code=422,
+            detail="Creating this relationship would introduce a cycle in the hierarchy",
+        )
 
-    child.parent_id = parent_id
+    await db.execute(update(Group).where(Group.id == child_id).values(parent_id=parent_id))
     await db.commit()
+    await invalidate("group", "groups", "site", "sites")
     return None
 
 
@@ -225,7 +328,8 @@ async def remove_child_from_group(
     """
     Remove a child group from a parent group.
     """
-    child = await db.get(Group, child_id)
+    result = await db.execute(select(Group.parent_id).where(Group.id == child_id))
+    child = result.one_or_none()
     if not child:
         raise HTTPException(status_code=404, detail="Child group not found")
 
@@ -234,6 +338,7 @@ async def remove_child_from_group(
             status_code=422, detail="This group is not a child of the specified parent"
         )
 
-    child.parent_id = None
+    await db.execute(update(Group).where(Group.id == child_id).values(parent_id=None))
     await db.commit()
+    await invalidate("group", "groups", "site", "sites")
     return None
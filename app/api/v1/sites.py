@@ -1,27 +1,29 @@
+import operator
 from datetime import date
-from typing import Any
 from enum import Enum
 
 from fastapi import APIRouter, Depends, Query, HTTPException, Path
-from fastcrud.paginated import PaginatedListResponse, compute_offset, paginated_response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
-from sqlalchemy.orm import selectinload
-from sqlalchemy import select
+from sqlalchemy.orm import joinedload, raiseload, selectinload, with_polymorphic
+from sqlalchemy import delete, select
 from infrastructure.models.site import Site as SiteModel
-from infrastructure.models.site import SiteCountry
+from infrastructure.models.site import SiteFrance, SiteItaly
 from infrastructure.models.group import Group
+from infrastructure.models.associations import site_group
 
-from infrastructure.db import get_session
+from infrastructure.cache import cache, invalidate
+from infrastructure.db import exists_by_id, get_readonly_session, get_session
+from infrastructure.pagination import MAX_ITEMS_PER_PAGE, get_sort_column, paginate
+from infrastructure.schemas.pagination import CursorPaginatedListResponse
 from infrastructure.schemas.site import (
     SiteRead,
-    Site,
     SiteBase,
     SiteWithGroups,
     SiteFranceCreate,
     SiteItalyCreate,
 )
-from infrastructure.crud.crud_sites import site_crud, site_france_crud, site_italy_crud
 from infrastructure.services.site_service import (
     create_french_site,
     create_italian_site,
@@ -38,12 +40,46 @@ class SortOrder(str, Enum):
     desc = "desc"
 
 
-@router.get("/", response_model=PaginatedListResponse[SiteWithGroups])
+PolymorphicSite = with_polymorphic(SiteModel, [SiteFrance, SiteItaly])
+
+# (query parameter, column, operator), in the order of `read_sites` filter parameters
+SITE_FILTERS = (
+    ("name", PolymorphicSite.name, operator.eq),
+    ("max_power_megawatt", PolymorphicSite.max_power_megawatt, operator.eq),
+    ("min_power_megawatt", PolymorphicSite.min_power_megawatt, operator.eq),
+    ("installation_date_from", PolymorphicSite.installation_date, operator.ge),
+    ("installation_date_to", PolymorphicSite.installation_date, operator.le),
+    (
+        "useful_energy_at_1_megawatt",
+        PolymorphicSite.SiteFrance.useful_energy_at_1_megawatt,
+        operator.eq,
+    ),
+    ("efficiency", PolymorphicSite.SiteItaly.efficiency, operator.eq),
+)
+
+# columns accepted by `sort_by`, each backed by a `(column, id)` index
+SITE_SORTABLE = ("id", "name", "installation_date", "max_power_megawatt", "min_power_megawatt")
+
+# `read_sites` serializes its page itself instead of going through `response_model`
+SITE_PAGE_ADAPTER = TypeAdapter(CursorPaginatedListResponse[SiteWithGroups])
+
+
+@router.get(
+    "/",
+    response_model=None,
+    responses={200: {"model": CursorPaginatedListResponse[SiteWithGroups]}},
+)
+@cache(
+    ttl="15s",
+    key="sites:{page}:{cursor}:{items_per_page}:{name}:{max_power_megawatt}:{min_power_megawatt}"
+    ":{installation_date_from}:{installation_date_to}:{useful_energy_at_1_megawatt}:{efficiency}"
+    ":{sort_by}:{sort_order}",
+)
 async def read_sites(
-    db: AsyncSession = Depends(get_session),
-    page: int = 1,
-    items_per_page: int = 10,
-    limit: int = 100,
+    db: AsyncSession = Depends(get_readonly_session),
+    page: int = Query(1, deprecated=True, description="Use `cursor` instead"),
+    cursor: str | None = Query(None, description="Cursor returned as `next_cursor`"),
+    items_per_page: int = Query(10, ge=1, le=MAX_ITEMS_PER_PAGE),
     name: str | None = None,
     max_power_megawatt: float | None = None,
     min_power_megawatt: float | None = None,
@@ -53,97 +89,86 @@ async def read_sites(
     efficiency: float | None = None,
     sort_by: str | None = Query(None, description="Field to sort by"),
     sort_order: SortOrder = SortOrder.desc,
-) -> dict:
+) -> ORJSONResponse:
     """
     Get all sites with filtering and sorting options.
     """
-    filters = {}
-
-    if name is not None:
-        filters["name"] = name
-
-    if max_power_megawatt is not None:
-        filters["max_power_megawatt"] = max_power_megawatt
-
-    if min_power_megawatt is not None:
-        filters["min_power_megawatt"] = min_power_megawatt
-
-    if useful_energy_at_1_megawatt is not None:
-        filters["useful_energy_at_1_megawatt"] = useful_energy_at_1_megawatt
-
-    if efficiency is not None:
-        filters["efficiency"] = efficiency
-
-    if installation_date_from is not None:
-        filters["installation_date__gte"] = installation_date_from
-
-    if installation_date_to is not None:
-        filters["installation_date__lte"] = installation_date_to
-
-    sites_data = await site_crud.get_multi(
-        db=db,
-        offset=compute_offset(page, items_per_page),
-        limit=items_per_page,
-        sort_columns=[sort_by] if sort_by else [],
-        sort_orders=[sort_order] if sort_by else [],
-        **filters
+    sites = SiteModel.__table__
+    sort_column = get_sort_column(sites, sort_by, SITE_SORTABLE)
+    values = (
+        name,
+        max_power_megawatt,
+        min_power_megawatt,
+        installation_date_from,
+        installation_date_to,
+        useful_energy_at_1_megawatt,
+        efficiency,
+    )
+    query = (
+        select(PolymorphicSite)
+        .options(selectinload(PolymorphicSite.groups), raiseload("*"))
+        .where(
+            *[
+                op(column, value)
+                for (_, column, op), value in zip(SITE_FILTERS, values, strict=True)
+                if value is not None
+            ]
+        )
     )
-    for site in sites_data["data"]:
-        if site["country"] == SiteCountry.france:
-            data = await site_france_crud.get(db=db, id=site["id"])
-            site["useful_energy_at_1_megawatt"] = data["useful_energy_at_1_megawatt"]
-        elif site["country"] == SiteCountry.italy:
-            data = await site_italy_crud.get(db=db, id=site["id"])
-            site["efficiency"] = data["efficiency"]
-
-    response: dict[str, Any] = paginated_response(
-        crud_data=sites_data, page=page, items_per_page=items_per_page
+
+    sites_data = await paginate(
+        db,
+        query,
+        id_column=sites.c.id,
+        sort_column=sort_column,
+        descending=sort_by is not None and sort_order == SortOrder.desc,
+        cursor=cursor,
+        page=page,
+        items_per_page=items_per_page,
     )
-    return response
+    sites_page = SITE_PAGE_ADAPTER.validate_python(sites_data, from_attributes=True)
+    return ORJSONResponse(SITE_PAGE_ADAPTER.dump_python(sites_page))
 
 
 @router.get("/{site_id}", response_model=SiteWithGroups)
+@cache(ttl="60s", key="site:{site_id}")
 async def read_site(
     site_id: int = Path(..., title="The ID of the site to get"),
-    db: AsyncSession = Depends(get_session),
+    db: AsyncSession = Depends(get_readonly_session),
 ) -> SiteWithGroups:
     """
     Get a specific site by ID.
     """
-    # FastCRUD not working with joined, why?
-    # site = await site_crud.get_multi_joined(
-    #     db=db,
-    #     id=site_id,
-    #     schema_to_select=SiteRead,
-    #     joins_config=joins_config
-    # )
+    # a single site: join its groups in rather than spending a second round-trip on them
     result = await db.execute(
-        select(SiteModel).options(selectinload(SiteModel.groups)).where(SiteModel.id == site_id)
+        select(PolymorphicSite)
+        .options(joinedload(PolymorphicSite.groups), raiseload("*"))
+        .where(PolymorphicSite.id == site_id)
     )
     site = result.unique().scalar_one_or_none()
     if not site:
         raise HTTPException(status_code=404, detail="Site not found")
-    if site.country == SiteCountry.france:
-        data = await site_france_crud.get(db=db, id=site.id)
-        site.useful_energy_at_1_megawatt = data["useful_energy_at_1_megawatt"]
-    elif site.country == SiteCountry.italy:
-        data = await site_italy_crud.get(db=db, id=site.id)
-        site.efficiency = data["efficiency"]
-    return site
+    return SiteWithGroups.model_validate(site)
 
 
 @router.post("/france", response_model=SiteRead, status_code=201)
 async def create_site_france(
     site: SiteFranceCreate, db: AsyncSession = Depends(get_session)
-) -> Site:
+) -> SiteRead:
     """Create a new french site."""
-    return await create_french_site(db, site)
+    created_site = await create_french_site(db, site)
+    await invalidate("sites")
+    return created_site
 
 
 @router.post("/italy", response_model=SiteRead, status_code=201)
-async def create_site_italy(site: SiteItalyCreate, db: AsyncSession = Depends(get_session)) -> Site:
+async def create_site_italy(
+    site: SiteItalyCreate, db: AsyncSession = Depends(get_session)
+) -> SiteRead:
     """Create a new italian site."""
-    return await create_italian_site(db, site)
+    created_site = await create_italian_site(db, site)
+    await invalidate("sites")
+    return created_site
 
 
 @router.patch("/{site_id}", response_model=SiteRead)
@@ -151,9 +176,11 @@ async def update_site_endpoint(
     site_update: SiteBase,
     site_id: int = Path(..., title="The ID of the site to update"),
     db: AsyncSession = Depends(get_session),
-) -> Site:
+) -> SiteRead:
     """Update a site."""
-    return await update_site(db, site_id, site_update)
+    updated_site = await update_site(db, site_id, site_update)
+    await invalidate("site", "sites")
+    return updated_site
 
 
 @router.delete("/{site_id}")
@@ -164,11 +191,12 @@ async def delete_site(
     """
     Delete a site.
     """
-    site = await site_crud.get(db=db, id=site_id)
-    if not site:
+    result = await db.execute(delete(SiteModel).where(SiteModel.id == site_id))
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Site not found")
 
-    await site_crud.delete(db=db, id=site_id)
+    await db.commit()
+    await invalidate("site", "sites")
     return {"message": "Site deleted successfully"}
 
 
@@ -182,6 +210,7 @@ async def add_site_to_group_endpoint(
     Add a site to a group.
     """
     await add_site_to_group(db, site_id, group_id)
+    await invalidate("site", "sites")
     return None
 
 
@@ -194,20 +223,16 @@ async def remove_site_from_group(
     """
     Remove a site from a group.
     """
-    site = await db.execute(
-        select(SiteModel).options(joinedload(SiteModel.groups)).where(SiteModel.id == site_id)
-    )
-    site = site.unique().scalar_one_or_none()
-    if not site:
+    if not await exists_by_id(db, SiteModel, site_id):
         raise HTTPException(status_code=404, detail="Site not found")
 
-    group = await db.get(Group, group_id)
-    if not group:
+    if not await exists_by_id(db, Group, group_id):
         raise HTTPException(status_code=404, detail="Group not found")
 
-    if group in site.groups:
-        site.groups.remove(group)
-        await db.commit()
-        await db.refresh(site)
+    await db.execute(
+        delete(site_group).where(site_group.c.site_id == site_id, site_group.c.group_id == group_id)
+    )
+    await db.commit()
+    await invalidate("site", "sites")
 
     return None
@@ -1,4 +1,4 @@
-from functools import lru_cache
+from functools import cache
 
 from pydantic import PostgresDsn
 from pydantic_settings import BaseSettings
@@ -7,6 +7,12 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     db_url: PostgresDsn
     db_test_url: PostgresDsn
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    db_pool_recycle: int = 1800
+    db_statement_cache_size: int = 500
+
+    cache_url: str = "mem://"
 
     postgres_db: str | None = None
     postgres_user: str | None = None
@@ -21,7 +27,7 @@ class Settings(BaseSettings):
     model_config = {"env_file": ".env", "extra": "ignore"}
 
 
-@lru_cache
+@cache
 def get_settings() -> Settings:
     settings = Settings()
     return settings
@@ -0,0 +1,13 @@
+from cashews import cache
+
+from config import get_settings
+
+cache.setup(get_settings().cache_url)
+
+
+async def invalidate(*prefixes: str) -> None:
+    """
+    Drop every cached response whose key starts with one of the given prefixes.
+    """
+    for prefix in prefixes:
+        await cache.delete_match(f"{prefix}:*")
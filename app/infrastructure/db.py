@@ -1,18 +1,81 @@
 from collections.abc import AsyncGenerator
 
 from config import get_settings
+from sqlalchemy import event, exists, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import Session
 
 Base = declarative_base()
 
-engine = create_async_engine(str(get_settings().db_url))
+settings = get_settings()
+engine = create_async_engine(
+    str(settings.db_url),
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=True,
+    # reuse the most recent connections so idle ones can time out on the server
+    pool_use_lifo=True,
+    connect_args={
+        "prepared_statement_cache_size": settings.db_statement_cache_size,
+        "statement_cache_size": settings.db_statement_cache_size,
+    },
+)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
 
+class ReadOnlySession(Session):
+    """Session whose transactions are all `READ ONLY`."""
+
+
+@event.listens_for(ReadOnlySession, "after_begin")
+def set_read_only(session, transaction, connection) -> None:
+    # runs when the session first touches the database, not when it is created,
+    # so requests answered from the cache don't check out a connection
+    connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+
+
+readonly_session_maker = async_sessionmaker(
+    engine, expire_on_commit=False, sync_session_class=ReadOnlySession
+)
+
+
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     try:
         db = async_session_maker()
         yield db
     finally:
         await db.close()
+
+
+async def get_readonly_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for read-only endpoints: its transactions are started as `READ ONLY`,
+    so Postgres doesn't assign them a transaction id.
+    """
+    async with readonly_session_maker() as db:
+        yield db
+
+
+def get_readonly_session_maker() -> async_sessionmaker[AsyncSession]:
+    """
+    Session maker for endpoints whose response outlives the request, such as streams,
+    which must open (and close) their session themselves.
+    """
+    return readonly_session_maker
+
+
+def violated_constraint(error: IntegrityError) -> str | None:
+    """
+    Name of the constraint whose violation raised `error`, as reported by asyncpg.
+    """
+    return getattr(error.orig.__cause__, "constraint_name", None)
+
+
+async def exists_by_id(db: AsyncSession, model, id_: int) -> bool:
+    """
+    Check whether a row of `model` with the given id exists, without loading it.
+    """
+    return await db.scalar(select(exists().where(model.id == id_)))
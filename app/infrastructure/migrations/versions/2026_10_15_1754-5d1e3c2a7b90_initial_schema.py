@@ -0,0 +1,87 @@
+"""initial schema
+
+Revision ID: 5d1e3c2a7b90
+Revises: 
+Create Date: 2026-10-15 17:54:11.155872
+
+"""
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1e3c2a7b90'
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # databases initialised by `scripts/init_db.py` before migrations existed already have
+    # this schema, the following revisions bring them up to date
+    if sa.inspect(op.get_bind()).has_table("sites"):
+        return
+
+    op.create_table(
+        "groups",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("type", sa.Enum("GROUP1", "GROUP2", "GROUP3", name="grouptype"), nullable=True),
+        sa.Column("parent_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["parent_id"], ["groups.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_groups_id", "groups", ["id"])
+    op.create_index("ix_groups_name", "groups", ["name"])
+
+    op.create_table(
+        "sites",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("installation_date", sa.Date(), nullable=True),
+        sa.Column("max_power_megawatt", sa.Float(), nullable=True),
+        sa.Column("min_power_megawatt", sa.Float(), nullable=True),
+        sa.Column("country", sa.Enum("france", "italy", name="sitecountry"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_sites_id", "sites", ["id"])
+    op.create_index("ix_sites_name", "sites", ["name"])
+
+    op.create_table(
+        "sites_france",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("useful_energy_at_1_megawatt", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(["id"], ["sites.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "sites_italy",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("efficiency", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(["id"], ["sites.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "site_group",
+        sa.Column("site_id", sa.Integer(), nullable=False),
+        sa.Column("group_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["group_id"], ["groups.id"]),
+        sa.ForeignKeyConstraint(["site_id"], ["sites.id"]),
+        sa.PrimaryKeyConstraint("site_id", "group_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("site_group")
+    op.drop_table("sites_italy")
+    op.drop_table("sites_france")
+    op.drop_index("ix_sites_name", table_name="sites")
+    op.drop_index("ix_sites_id", table_name="sites")
+    op.drop_table("sites")
+    op.drop_index("ix_groups_name", table_name="groups")
+    op.drop_index("ix_groups_id", table_name="groups")
+    op.drop_table("groups")
+    sa.Enum(name="sitecountry").drop(op.get_bind())
+    sa.Enum(name="grouptype").drop(op.get_bind())
@@ -0,0 +1,80 @@
+"""listing indexes and cascading deletes
+
+Revision ID: 9a4f6b8c2e13
+Revises: 5d1e3c2a7b90
+Create Date: 2026-10-15 17:54:11.896511
+
+"""
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4f6b8c2e13'
+down_revision: str | None = '5d1e3c2a7b90'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# (name, table, columns) of the `(sort column, id)` indexes backing keyset pagination
+LISTING_INDEXES = (
+    ("ix_sites_name_id", "sites", ["name", "id"]),
+    ("ix_sites_installation_date_id", "sites", ["installation_date", "id"]),
+    (
+        "ix_sites_installation_date_desc_id",
+        "sites",
+        [sa.text("installation_date DESC NULLS LAST"), sa.text("id DESC")],
+    ),
+    ("ix_sites_max_power_megawatt_id", "sites", ["max_power_megawatt", "id"]),
+    ("ix_sites_min_power_megawatt_id", "sites", ["min_power_megawatt", "id"]),
+    ("ix_groups_name_id", "groups", ["name", "id"]),
+    ("ix_site_group_group_id_site_id", "site_group", ["group_id", "site_id"]),
+)
+
+# (constraint, table, column, referred table, ondelete) of the foreign keys whose rows are
+# cleaned up by the database, so that sites and groups are deleted in a single statement
+FOREIGN_KEYS = (
+    ("site_group_site_id_fkey", "site_group", "site_id", "sites", "CASCADE"),
+    ("site_group_group_id_fkey", "site_group", "group_id", "groups", "CASCADE"),
+    ("groups_parent_id_fkey", "groups", "parent_id", "groups", "SET NULL"),
+)
+
+
+def replace_foreign_keys(with_ondelete: bool) -> None:
+    for name, table, column, referred_table, ondelete in FOREIGN_KEYS:
+        # databases created by `create_all` may already have the new constraints
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS "{name}"')
+        op.create_foreign_key(
+            name,
+            table,
+            referred_table,
+            [column],
+            ["id"],
+            ondelete=ondelete if with_ondelete else None,
+        )
+
+
+def upgrade() -> None:
+    for name, table, columns in LISTING_INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+    # only one french site can be installed per day
+    op.create_index(
+        "uq_sites_france_installation_date",
+        "sites",
+        ["installation_date"],
+        unique=True,
+        postgresql_where=sa.text("country = 'france'"),
+        if_not_exists=True,
+    )
+
+    replace_foreign_keys(with_ondelete=True)
+
+
+def downgrade() -> None:
+    replace_foreign_keys(with_ondelete=False)
+
+    op.drop_index("uq_sites_france_installation_date", table_name="sites")
+    for name, table, _ in reversed(LISTING_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -1,9 +1,11 @@
-from sqlalchemy import Table, Column, ForeignKey
+from sqlalchemy import Table, Column, ForeignKey, Index
 from ..db import Base
 
 site_group = Table(
     "site_group",
     Base.metadata,
-    Column("site_id", ForeignKey("sites.id"), primary_key=True),
-    Column("group_id", ForeignKey("groups.id"), primary_key=True),
+    Column("site_id", ForeignKey("sites.id", ondelete="CASCADE"), primary_key=True),
+    Column("group_id", ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True),
+    # the primary key only covers lookups by site, this one serves lookups by group
+    Index("ix_site_group_group_id_site_id", "group_id", "site_id"),
 )
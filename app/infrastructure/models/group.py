@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 import enum
 
@@ -21,7 +21,11 @@ class Group(Base):
     name = Column(String, index=True, nullable=False)
     type = Column(Enum(GroupType), nullable=True)
 
-    parent_id = Column(Integer, ForeignKey("groups.id"))
+    parent_id = Column(Integer, ForeignKey("groups.id", ondelete="SET NULL"))
     children = relationship("Group", backref="parent", remote_side=[id])
 
-    sites = relationship("Site", secondary=site_group, back_populates="groups")
+    sites = relationship(
+        "Site", secondary=site_group, back_populates="groups", passive_deletes=True
+    )
+
+    __table_args__ = (Index("ix_groups_name_id", "name", "id"),)
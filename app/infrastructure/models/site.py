@@ -1,5 +1,5 @@
 from typing import ClassVar
-from sqlalchemy import Column, Integer, Float, String, Date, Enum, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Date, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 import enum
 
@@ -26,8 +26,28 @@ class Site(Base):
     country = Column(Enum(SiteCountry), nullable=False)
 
     __mapper_args__: ClassVar = {"polymorphic_on": country, "polymorphic_identity": None}
-
-    groups = relationship("Group", secondary=site_group, back_populates="sites")
+    __table_args__ = (
+        Index("ix_sites_name_id", "name", "id"),
+        Index("ix_sites_installation_date_id", "installation_date", "id"),
+        # listings are sorted in descending order by default, with NULL values last
+        Index(
+            "ix_sites_installation_date_desc_id", installation_date.desc().nulls_last(), id.desc()
+        ),
+        Index("ix_sites_max_power_megawatt_id", "max_power_megawatt", "id"),
+        Index("ix_sites_min_power_megawatt_id", "min_power_megawatt", "id"),
+        # only one french site can be installed per day
+        Index(
+            "uq_sites_france_installation_date",
+            installation_date,
+            unique=True,
+            postgresql_where=country == SiteCountry.france,
+        ),
+    )
+
+    # a site is always returned with its groups; queries can still override this loader
+    groups = relationship(
+        "Group", secondary=site_group, back_populates="sites", lazy="selectin", passive_deletes=True
+    )
 
 
 class SiteFrance(Site):
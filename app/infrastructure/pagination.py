@@ -0,0 +1,158 @@
+import base64
+import binascii
+import json
+import operator
+from datetime import date
+from typing import Any
+
+from fastapi import HTTPException
+from fastcrud.paginated import compute_offset
+from sqlalchemy import Select, and_, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# upper bound of `items_per_page`, which keeps every page (and its response) small in memory
+MAX_ITEMS_PER_PAGE = 100
+
+
+def encode_cursor(sort_value: Any, id_value: int, total_count: int) -> str:
+    """
+    Encode the position of the last returned row into an opaque cursor.
+    The total count of the listing is carried along so that following pages don't recount it.
+    """
+    payload = json.dumps([sort_value, id_value, total_count], default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort_column) -> tuple[Any, int, int]:
+    """
+    Decode a cursor produced by `encode_cursor` into a `(sort_value, id, total_count)` tuple.
+    The sort value is converted back to the python type of `sort_column`.
+    """
+    try:
+        sort_value, id_value, total_count = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort_value is not None and sort_column is not None:
+            python_type = sort_column.type.python_type
+            if issubclass(python_type, date):
+                sort_value = python_type.fromisoformat(sort_value)
+            else:
+                sort_value = python_type(sort_value)
+        total_count = int(total_count)
+        if total_count < 0:
+            raise ValueError("negative total count")
+        return sort_value, int(id_value), total_count
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise HTTPException(status_code=422, detail="Invalid cursor") from e
+
+
+def get_sort_column(table, sort_by: str | None, sortable: tuple[str, ...]):
+    """
+    Resolve the `sort_by` query parameter to a column of `table`.
+    Only the `sortable` columns, which are backed by an index, are accepted.
+    """
+    if sort_by is None:
+        return None
+    if sort_by not in sortable:
+        raise HTTPException(status_code=422, detail=f"Cannot sort by '{sort_by}'")
+    return table.c[sort_by]
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    id_column,
+    sort_column=None,
+    descending: bool = False,
+    cursor: str | None = None,
+    page: int = 1,
+    items_per_page: int = 10,
+) -> dict:
+    """
+    Paginate the entity `query` by keyset: rows are ordered by `(sort_column, id_column)`
+    and the page starts right after the position encoded in `cursor`.
+    NULL sort values are always placed last.
+    Without cursor, `page` is used as a (deprecated) offset fallback.
+    The total count is computed by a window function in the same statement, then carried
+    along in the cursor: following pages report this snapshot from the first page rather than
+    recounting, so it doesn't reflect rows written since, and a cursor is trusted for it as it
+    is for the position.
+    """
+    count_query = select(func.count()).select_from(query.order_by(None).subquery())
+
+    compare = operator.lt if descending else operator.gt
+    id_order = id_column.desc() if descending else id_column.asc()
+
+    if sort_column is None:
+        query = query.order_by(id_order)
+    else:
+        sort_order = sort_column.desc() if descending else sort_column.asc()
+        query = query.order_by(sort_order.nulls_last(), id_order)
+
+    if cursor is not None:
+        sort_value, id_value, total_count = decode_cursor(cursor, sort_column)
+        if sort_column is None:
+            query = query.where(compare(id_column, id_value))
+        elif sort_value is None:
+            query = query.where(and_(sort_column.is_(None), compare(id_column, id_value)))
+        else:
+            query = query.where(
+                or_(
+                    compare(tuple_(sort_column, id_column), (sort_value, id_value)),
+                    sort_column.is_(None),
+                )
+            )
+    else:
+        query = query.add_columns(func.count().over().label("total_count"))
+        if page > 1:
+            query = query.offset(compute_offset(page, items_per_page))
+
+    rows = (await db.execute(query.limit(items_per_page + 1))).all()
+    if cursor is None:
+        if rows:
+            total_count = rows[0].total_count
+        elif page > 1:
+            # past the last page: the window function had no row to report the count on
+            total_count = await db.scalar(count_query)
+        else:
+            total_count = 0
+
+    return build_page(
+        [row[0] for row in rows],
+        total_count,
+        id_column=id_column,
+        sort_column=sort_column,
+        cursor=cursor,
+        page=page,
+        items_per_page=items_per_page,
+    )
+
+
+def build_page(
+    data: list,
+    total_count: int,
+    id_column,
+    sort_column=None,
+    cursor: str | None = None,
+    page: int = 1,
+    items_per_page: int = 10,
+) -> dict:
+    """
+    Build the paginated response from up to `items_per_page + 1` fetched rows,
+    the extra row only signaling that another page exists.
+    """
+    has_more = len(data) > items_per_page
+    data = data[:items_per_page]
+
+    next_cursor = None
+    if has_more:
+        last = data[-1]
+        sort_value = getattr(last, sort_column.key) if sort_column is not None else None
+        next_cursor = encode_cursor(sort_value, getattr(last, id_column.key), total_count)
+
+    return {
+        "data": data,
+        "total_count": total_count,
+        "has_more": has_more,
+        "page": page if cursor is None else None,
+        "items_per_page": items_per_page,
+        "next_cursor": next_cursor,
+    }
@@ -16,9 +16,3 @@ class GroupCreate(GroupBase):
 class GroupRead(GroupBase):
     model_config = ConfigDict(from_attributes=True)
     id: int
-
-
-class Group(GroupBase):
-    model_config = ConfigDict(from_attributes=True)
-
-    id: int
@@ -0,0 +1,13 @@
+from typing import Generic, TypeVar
+
+from fastcrud.paginated import PaginatedListResponse
+from pydantic import BaseModel, Field
+
+SchemaType = TypeVar("SchemaType", bound=BaseModel)
+
+
+class CursorPaginatedListResponse(PaginatedListResponse[SchemaType], Generic[SchemaType]):
+    total_count: int = Field(
+        description="Count of the listing when its first page was read, carried along in cursors"
+    )
+    next_cursor: str | None = None
@@ -1,8 +1,4 @@
 from datetime import date
-from typing import TYPE_CHECKING
-
-if TYPE_CHECKING:
-    from infrastructure.schemas.group import GroupRead
 
 from pydantic import BaseModel, ConfigDict
 from infrastructure.models.site import SiteCountry
@@ -60,14 +56,6 @@ class SiteUpdate(BaseModel):
     efficiency: float | None = None
 
 
-class Site(SiteBase):
-    model_config = ConfigDict(from_attributes=True)
-
-    id: int
-    useful_energy_at_1_megawatt: float | None = None
-    efficiency: float | None = None
-
-
 class SiteWithGroups(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -79,4 +67,4 @@ class SiteWithGroups(BaseModel):
     country: SiteCountry
     useful_energy_at_1_megawatt: float | None = None
     efficiency: float | None = None
-    groups: list["GroupRead"] = []
+    groups: list[GroupRead] = []
@@ -1,28 +1,39 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
-from sqlalchemy import select
-from sqlalchemy.orm import with_polymorphic, selectinload
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
 
+from infrastructure.db import violated_constraint
 from infrastructure.validators import (
     validate_french_site_date,
     validate_italian_site_date,
     validate_site_group_association
 )
-from infrastructure.models.site import SiteCountry, Site, SiteFrance, SiteItaly
+from infrastructure.models.site import SiteCountry, Site
+from infrastructure.models.associations import site_group
 from infrastructure.models.group import Group
-from infrastructure.schemas.site import SiteFranceCreate, SiteItalyCreate, SiteBase, SiteRead
-from infrastructure.crud.crud_sites import site_crud, site_france_crud, site_italy_crud
+from infrastructure.schemas.site import SiteFranceCreate, SiteItalyCreate, SiteBase
+from infrastructure.crud.crud_sites import site_france_crud, site_italy_crud
 
+# unique index of `Site` enforcing the one french site per day rule
+FRENCH_SITE_DATE_CONSTRAINT = "uq_sites_france_installation_date"
+# foreign keys of `site_group`
+SITE_GROUP_SITE_CONSTRAINT = "site_group_site_id_fkey"
+SITE_GROUP_GROUP_CONSTRAINT = "site_group_group_id_fkey"
 
-async def create_french_site(db: AsyncSession, site: SiteFranceCreate):
-    if site.installation_date:
-        valid = await validate_french_site_date(db, site.installation_date)
-        if not valid:
-            raise HTTPException(
-                status_code=422, detail="Only one French site can be installed per day"
-            )
 
-    return await site_france_crud.create(db=db, object=site)
+async def create_french_site(db: AsyncSession, site: SiteFranceCreate):
+    # the one french site per day rule is enforced by a unique index
+    try:
+        return await site_france_crud.create(db=db, object=site)
+    except IntegrityError as e:
+        await db.rollback()
+        if violated_constraint(e) != FRENCH_SITE_DATE_CONSTRAINT:
+            raise
+        raise HTTPException(
+            status_code=422, detail="Only one French site can be installed per day"
+        ) from e
 
 
 async def create_italian_site(db: AsyncSession, site: SiteItalyCreate):
@@ -37,12 +48,12 @@ async def create_italian_site(db: AsyncSession, site: SiteItalyCreate):
 
 
 async def update_site(db: AsyncSession, site_id: int, site_update: SiteBase):
-    site = await site_crud.get(db=db, id=site_id)
-    if not site:
-        raise HTTPException(status_code=404, detail="Site not found")
+    if site_update.installation_date:
+        country = await db.scalar(select(Site.country).where(Site.id == site_id))
+        if country is None:
+            raise HTTPException(status_code=404, detail="Site not found")
 
-    if hasattr(site_update, "installation_date") and site_update.installation_date:
-        if site["country"] == SiteCountry.france:
+        if country == SiteCountry.france:
             valid = await validate_french_site_date(
                 db, site_update.installation_date, exclude_site_id=site_id
             )
@@ -50,46 +61,61 @@ async def update_site(db: AsyncSession, site_id: int, site_update: SiteBase):
                 raise HTTPException(
                     status_code=422, detail="Only one French site can be installed per day"
                 )
-        elif site["country"] == SiteCountry.italy:
+        elif country == SiteCountry.italy:
             valid = await validate_italian_site_date(site_update.installation_date)
             if not valid:
                 raise HTTPException(
                     status_code=422, detail="Italian sites must be installed on weekends"
                 )
 
-    updated_site = await site_crud.update(
-        db=db, object=site_update, id=site_id, return_as_model=True, schema_to_select=SiteRead
-    )
-    return updated_site
+    try:
+        result = await db.execute(
+            update(Site)
+            .where(Site.id == site_id)
+            .values(**site_update.model_dump(exclude_unset=True))
+            .returning(*Site.__table__.c)
+        )
+    except IntegrityError as e:
+        await db.rollback()
+        # another french site took the date after the check above
+        if violated_constraint(e) != FRENCH_SITE_DATE_CONSTRAINT:
+            raise
+        raise HTTPException(
+            status_code=422, detail="Only one French site can be installed per day"
+        ) from e
+    updated_site = result.mappings().one_or_none()
+    if not updated_site:
+        raise HTTPException(status_code=404, detail="Site not found")
+
+    await db.commit()
+    return dict(updated_site)
 
 
 async def add_site_to_group(db: AsyncSession, site_id: int, group_id: int):
-    valid = await validate_site_group_association(db, site_id, group_id)
+    # the group type tells both whether the group exists and whether the site can join it
+    group = (await db.execute(select(Group.type).where(Group.id == group_id))).one_or_none()
+    if group is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    valid = await validate_site_group_association(group.type)
     if not valid:
         raise HTTPException(
             status_code=422, detail="Invalid association between site and group"
         )
-    
-    result = await db.execute(select(Group).where(Group.id == group_id))
-    group = result.scalar_one_or_none()
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-
-    PolymorphicSite = with_polymorphic(Site, [SiteFrance, SiteItaly])
-    
-    result = await db.execute(
-        select(PolymorphicSite)
-        .options(selectinload(PolymorphicSite.groups))
-        .where(PolymorphicSite.id == site_id)
-    )
-    
-    site_model = result.unique().scalar_one_or_none()
-    if not site_model:
-        raise HTTPException(status_code=404, detail="Site not found")
 
-    if group not in site_model.groups:
-        site_model.groups.append(group)
-        
-        await db.commit()
+    try:
+        await db.execute(
+            insert(site_group).values(site_id=site_id, group_id=group_id).on_conflict_do_nothing()
+        )
+    except IntegrityError as e:
+        await db.rollback()
+        constraint = violated_constraint(e)
+        if constraint == SITE_GROUP_SITE_CONSTRAINT:
+            raise HTTPException(status_code=404, detail="Site not found") from e
+        if constraint == SITE_GROUP_GROUP_CONSTRAINT:
+            # the group was deleted after it was read above
+            raise HTTPException(status_code=404, detail="Group not found") from e
+        raise
+    await db.commit()
 
     return None
@@ -1,8 +1,8 @@
 from datetime import date
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import exists, literal, select
 
-from infrastructure.models.site import SiteFrance
+from infrastructure.models.site import Site, SiteCountry
 from infrastructure.models.group import Group, GroupType
 
 async def validate_french_site_date(
@@ -14,15 +14,14 @@ async def validate_french_site_date(
     Check if a french site with same date does not already exists (only 1 french site per day can be created).
     Return True if the date is valid, otherwise False.
     """
-    query = select(SiteFrance).where(SiteFrance.installation_date == installation_date)
-    
+    query = exists().where(
+        Site.country == SiteCountry.france, Site.installation_date == installation_date
+    )
+
     if exclude_site_id is not None:
-        query = query.where(SiteFrance.id != exclude_site_id)
-    
-    result = await db.execute(query)
-    existing_site = result.scalars().first()
-    
-    return existing_site is None
+        query = query.where(Site.id != exclude_site_id)
+
+    return not await db.scalar(select(query))
 
 async def validate_italian_site_date(installation_date: date) -> bool:
     """
@@ -33,12 +32,31 @@ async def validate_italian_site_date(installation_date: date) -> bool:
     return weekday >= 5  # 5=saturday, 6=sunday
 
 
-async def validate_site_group_association(db: AsyncSession, site_id: int, group_id: int) -> bool:
+async def validate_site_group_association(group_type: GroupType | None) -> bool:
     """
-    Validate the association between a site and a group. Site can't be associated with a group of type GROUP3.
+    Validate the association between a site and a group of type `group_type`.
+    Site can't be associated with a group of type GROUP3.
     Return True if the association is valid, otherwise False.
     """
-    result = await db.execute(select(Group).where(Group.id == group_id))
-    group = result.scalars().first()
+    return group_type != GroupType.GROUP3
+
+
+async def validate_group_parent(db: AsyncSession, parent_id: int, child_id: int) -> bool:
+    """
+    Validate that `parent_id` can become the parent of `child_id`, i.e. that `child_id` is not
+    already an ancestor of `parent_id` (which would introduce a cycle in the hierarchy).
+    All ancestors are resolved in a single recursive query. Its `UNION` drops the rows already
+    seen, so it also ends on a hierarchy which already contains a cycle.
+    Return True if the relationship is valid, otherwise False.
+    """
+    ancestors = (
+        select(Group.id, Group.parent_id)
+        .where(Group.id == parent_id)
+        .cte("ancestors", recursive=True)
+    )
+    ancestors = ancestors.union(
+        select(Group.id, Group.parent_id).join(ancestors, Group.id == ancestors.c.parent_id)
+    )
+    cycle = await db.scalar(select(literal(1)).where(ancestors.c.id == child_id).limit(1))
 
-    return group is not None and group.type != GroupType.GROUP3
+    return cycle is None
@@ -1,8 +1,9 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
 from api.v1 import router as api_v1_router
 
-app = FastAPI(title="Python technical test")
+app = FastAPI(title="Python technical test", default_response_class=ORJSONResponse)
 
 app.include_router(api_v1_router, prefix="/api")
 
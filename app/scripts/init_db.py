@@ -1,14 +1,19 @@
 import asyncio
+import logging
 import random
+from itertools import chain
 from datetime import date, timedelta
 
-from sqlalchemy import select, text
+from sqlalchemy import Sequence, func, inspect, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 
 from infrastructure.db import async_session_maker, Base
 from infrastructure.models.site import Site, SiteFrance, SiteItaly, SiteCountry
 from infrastructure.models.group import Group, GroupType
+from infrastructure.models.associations import site_group
+
+logger = logging.getLogger(__name__)
 
 
 async def is_database_seeded(session: AsyncSession):
@@ -17,101 +22,139 @@ async def is_database_seeded(session: AsyncSession):
     return result.first() is not None
 
 
+async def reserve_ids(session: AsyncSession, table, count: int) -> list[int]:
+    """Draw `count` ids from the id sequence of `table`."""
+    result = await session.execute(
+        select(Sequence(f"{table.name}_id_seq").next_value()).select_from(
+            func.generate_series(1, count)
+        )
+    )
+    return list(result.scalars())
+
+
+async def copy_rows(session: AsyncSession, table, rows: list[dict]):
+    """Bulk load `rows` into `table` with the binary COPY protocol."""
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        table.name, columns=list(rows[0]), records=[tuple(row.values()) for row in rows]
+    )
+
+
 async def generate_seed_data(session: AsyncSession):
     """Generate and insert sample data into the database."""
+    # a fixed seed makes every reseed produce the same data
+    rng = random.Random(0)
+    today = date.today()
+
     french_sites = []
     for i in range(1, 6):
-        install_date = date.today() - timedelta(days=i * 3)
-        french_site = SiteFrance(
-            name=f"Site France {i}",
-            installation_date=install_date,
-            max_power_megawatt=random.uniform(10.0, 50.0),
-            min_power_megawatt=random.uniform(1.0, 5.0),
-            useful_energy_at_1_megawatt=random.uniform(0.7, 0.95),
-            country=SiteCountry.france,
+        install_date = today - timedelta(days=i * 3)
+        french_sites.append(
+            {
+                "name": f"Site France {i}",
+                "installation_date": install_date,
+                "max_power_megawatt": rng.uniform(10.0, 50.0),
+                "min_power_megawatt": rng.uniform(1.0, 5.0),
+                "country": SiteCountry.france.name,
+            }
         )
-        french_sites.append(french_site)
 
     italian_sites = []
     for i in range(1, 6):
-        days_until_weekend = (5 - date.today().weekday() + (i - 1) * 7) % 7
-        if days_until_weekend == 0:
-            install_date = date.today() + timedelta(days=(i - 1) * 7)
-        else:
-            install_date = date.today() + timedelta(days=days_until_weekend + (i - 1) * 7)
-
-        italian_site = SiteItaly(
-            name=f"Site Italia {i}",
-            installation_date=install_date,
-            max_power_megawatt=random.uniform(15.0, 60.0),
-            min_power_megawatt=random.uniform(2.0, 8.0),
-            efficiency=random.uniform(0.6, 0.9),
-            country=SiteCountry.italy,
+        # i-th saturday from today (included)
+        install_date = today + timedelta(days=(5 - today.weekday()) % 7 + (i - 1) * 7)
+
+        italian_sites.append(
+            {
+                "name": f"Site Italia {i}",
+                "installation_date": install_date,
+                "max_power_megawatt": rng.uniform(15.0, 60.0),
+                "min_power_megawatt": rng.uniform(2.0, 8.0),
+                "country": SiteCountry.italy.name,
+            }
         )
-        italian_sites.append(italian_site)
 
-    all_sites = french_sites + italian_sites
-    session.add_all(all_sites)
-    await session.commit()
-
-    for site in all_sites:
-        await session.refresh(site)
+    # ids are drawn upfront since COPY can't return them
+    site_ids = await reserve_ids(session, Site.__table__, len(french_sites) + len(italian_sites))
+    all_sites = [
+        {"id": site_id, **site}
+        for site_id, site in zip(site_ids, chain(french_sites, italian_sites), strict=True)
+    ]
+    await copy_rows(session, Site.__table__, all_sites)
+    await copy_rows(
+        session,
+        SiteFrance.__table__,
+        [
+            {"id": site["id"], "useful_energy_at_1_megawatt": rng.uniform(0.7, 0.95)}
+            for site in all_sites[: len(french_sites)]
+        ],
+    )
+    await copy_rows(
+        session,
+        SiteItaly.__table__,
+        [
+            {"id": site["id"], "efficiency": rng.uniform(0.6, 0.9)}
+            for site in all_sites[len(french_sites) :]
+        ],
+    )
 
+    group_types = [GroupType.GROUP1, GroupType.GROUP2, GroupType.GROUP3]
+    group_ids = await reserve_ids(session, Group.__table__, 4)
     groups = [
-        Group(
-            name=f"Groupe {i}", type=[GroupType.GROUP1, GroupType.GROUP2, GroupType.GROUP3][i % 3]
-        )
-        for i in range(1, 5)
+        {"id": group_id, "name": f"Groupe {i}", "type": group_types[i % 3].name, "parent_id": None}
+        for i, group_id in enumerate(group_ids, start=1)
     ]
-
-    session.add_all(groups)
-    await session.commit()
-
-    valid_groups = [group for group in groups if group.type != GroupType.GROUP3]
-
-    for site in all_sites:
-        selected_group_count = min(len(valid_groups), random.randint(1, 2))
-        selected_groups = random.sample(valid_groups, k=selected_group_count)
-
-        for group in selected_groups:
-            await session.execute(
-                text("INSERT INTO site_group (site_id, group_id) VALUES (:site_id, :group_id)"),
-                {"site_id": site.id, "group_id": group.id},
-            )
-
     if len(groups) >= 3:
-        groups[2].parent_id = groups[0].id
+        groups[2]["parent_id"] = groups[0]["id"]
+    await copy_rows(session, Group.__table__, groups)
 
-    await session.commit()
+    valid_groups = [group for group in groups if group["type"] != GroupType.GROUP3.name]
 
-    print(
-        f"Seeded {len(french_sites)} French sites, {len(italian_sites)} Italian sites, and {len(groups)} groups."
+    associations = [
+        {"site_id": site["id"], "group_id": group["id"]}
+        for site in all_sites
+        for group in rng.sample(valid_groups, k=min(len(valid_groups), rng.randint(1, 2)))
+    ]
+    await copy_rows(session, site_group, associations)
+
+    logger.info(
+        "Seeded %d French sites, %d Italian sites, %d groups and %d site-group associations.",
+        len(french_sites),
+        len(italian_sites),
+        len(groups),
+        len(associations),
     )
-    # print(f"Created {sum(len(site.groups) for site in all_sites)} site-group associations.")
 
 
 async def seed_data():
     """Seed database with sample data."""
-    async with async_session_maker() as session:
+    # purge and reseed in a single transaction, committed once
+    async with async_session_maker() as session, session.begin():
         if await is_database_seeded(session):
-            print("Data already seeded. Purging and reseeding...")
-            await session.execute(text("DELETE FROM site_group"))
-            await session.execute(text("DELETE FROM sites"))
-            await session.execute(text("DELETE FROM groups"))
-            await session.commit()
+            logger.info("Data already seeded. Purging and reseeding...")
+            await session.execute(
+                text("TRUNCATE TABLE site_group, sites, groups RESTART IDENTITY CASCADE")
+            )
 
-        print("Seeding database with test data...")
+        logger.info("Seeding database with test data...")
         await generate_seed_data(session)
-        print("Seeding completed.")
+        logger.info("Seeding completed.")
 
 
 async def main():
     engine = create_async_engine("postgresql+asyncpg://user:password@db/dbname")
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        # create_all only adds missing tables, so it is skipped once they all exist: changes to
+        # existing tables are applied by the migrations (`alembic upgrade head`)
+        tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+        if not set(tables).issuperset(Base.metadata.tables):
+            await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
 
     await seed_data()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     asyncio.run(main())
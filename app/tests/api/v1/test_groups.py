@@ -1,144 +1,116 @@
-import pytest
 from faker import Faker
 from httpx import AsyncClient
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from api.v1.groups import read_group_sites
+from infrastructure.db import get_readonly_session_maker
+from infrastructure.models.associations import site_group
 from infrastructure.models.group import Group, GroupType
+from infrastructure.models.site import Site
+from main import app
 
-fake = Faker()
 
+# ---- read group by ID ----
 
-# ---- read groups ----
-@pytest.mark.asyncio
-async def test_get_all_groups(client: AsyncClient, sample_groups: list[Group]):
-    """Test getting all groups without filters."""
-    response = client.get("/api/v1/groups/")
-    assert response.status_code == 200
-
-    json_data = response.json()
-    assert "data" in json_data
-    data = json_data["data"]
-
-    group_ids = {group.id for group in sample_groups}
-    response_ids = {group["id"] for group in data}
-
-    assert group_ids.issubset(response_ids)
 
+async def test_read_group_success(client: AsyncClient, sample_groups: list[Group]):
+    """Test successfully retrieving a group by ID."""
+    sample_group = sample_groups[0]
 
-@pytest.mark.asyncio
-async def test_get_groups_pagination(client: AsyncClient):
-    """Test pagination for groups."""
-    page = 1
-    items_per_page = 3
+    response = await client.get(f"/api/v1/groups/{sample_group.id}")
 
-    response = client.get(f"/api/v1/groups/?page={page}&items_per_page={items_per_page}")
     assert response.status_code == 200
+    result = response.json()
+    assert result["id"] == sample_group.id
+    assert result["name"] == sample_group.name
+    assert result["type"] == sample_group.type.value
 
-    json_data = response.json()
-    assert "data" in json_data
-    assert "page" in json_data
-    assert "items_per_page" in json_data
-    assert "total_count" in json_data
-    assert "has_more" in json_data
-
-    assert len(json_data["data"]) <= items_per_page
 
-    if json_data["has_more"]:
-        page_2 = 2
-        response2 = client.get(f"/api/v1/groups/?page={page_2}&items_per_page={items_per_page}")
-        assert response2.status_code == 200
+async def test_read_group_not_found(client: AsyncClient):
+    """Test handling of non-existent group ID."""
+    non_existent_id = 9999
+    response = await client.get(f"/api/v1/groups/{non_existent_id}")
 
-        json_data2 = response2.json()
+    assert response.status_code == 404
 
-        first_page_ids = {group["id"] for group in json_data["data"]}
-        second_page_ids = {group["id"] for group in json_data2["data"]}
-        assert not first_page_ids.intersection(second_page_ids)
 
+# ---- read group sites ----
 
-@pytest.mark.asyncio
-async def test_get_groups_filter_by_name(client: AsyncClient, sample_groups: list[Group]):
-    """Test filtering groups by name."""
-    if not sample_groups:
-        pytest.skip("No sample groups available for testing")
 
-    sample_name = sample_groups[0].name
+async def test_read_group_sites(
+    client: AsyncClient, db: AsyncSession, sample_sites: list[Site], sample_groups: list[Group]
+):
+    """Test streaming the sites of a group, each with all of its groups."""
+    shared_site, other_site = sample_sites[0], sample_sites[1]
+    group, other_group = sample_groups[0], sample_groups[1]
+    await db.execute(
+        insert(site_group),
+        [
+            {"site_id": shared_site.id, "group_id": group.id},
+            {"site_id": shared_site.id, "group_id": other_group.id},
+            {"site_id": other_site.id, "group_id": group.id},
+        ],
+    )
+    await db.commit()
 
-    response = client.get(f"/api/v1/groups/?name={sample_name}")
+    response = await client.get(f"/api/v1/groups/{group.id}/sites")
     assert response.status_code == 200
 
-    json_data = response.json()
-    assert "data" in json_data
-    data = json_data["data"]
-    assert len(data) > 0
-
-    for group in data:
-        assert sample_name.lower() in group["name"].lower()
+    data = response.json()
+    assert [site["id"] for site in data] == sorted([shared_site.id, other_site.id])
 
+    groups_by_site = {site["id"]: [g["id"] for g in site["groups"]] for site in data}
+    assert groups_by_site[shared_site.id] == sorted([group.id, other_group.id])
+    assert groups_by_site[other_site.id] == [group.id]
 
-@pytest.mark.asyncio
-async def test_get_groups_sorting(client: AsyncClient, sample_groups: list[Group]):
-    """Test sorting groups by name."""
-    response = client.get("/api/v1/groups/?sort_by=name&sort_order=asc")
-    assert response.status_code == 200
-
-    json_data = response.json()
-    assert "data" in json_data
-    data = json_data["data"]
-
-    if len(data) < 2:
-        pytest.skip("Not enough groups for sorting test")
 
-    names = [group["name"] for group in data]
-    assert names == sorted(names)
+async def test_read_group_sites_empty(client: AsyncClient, sample_groups: list[Group]):
+    """Test streaming the sites of a group without sites."""
+    response = await client.get(f"/api/v1/groups/{sample_groups[2].id}/sites")
 
-    response = client.get("/api/v1/groups/?sort_by=name&sort_order=desc")
     assert response.status_code == 200
+    assert response.json() == []
 
-    json_data = response.json()
-    data = json_data["data"]
-    names = [group["name"] for group in data]
-    assert names == sorted(names, reverse=True)
 
+async def test_read_group_sites_not_found(client: AsyncClient):
+    """Test streaming the sites of a non-existent group."""
+    response = await client.get("/api/v1/groups/99999/sites")
 
-# ---- read group by ID ----
-
-
-@pytest.mark.asyncio
-async def test_read_group_success(client: AsyncClient, sample_groups: list[Group]):
-    """Test successfully retrieving a group by ID."""
-    sample_group = sample_groups[0]
+    assert response.status_code == 404
 
-    response = client.get(f"/api/v1/groups/{sample_group.id}")
 
-    assert response.status_code == 200
-    result = response.json()
-    assert result["id"] == sample_group.id
-    assert result["name"] == sample_group.name
-    assert result["type"] == sample_group.type.value
+async def test_read_group_sites_closes_unread_stream(sample_groups: list[Group]):
+    """Test that the streaming session is closed even if the response body is never read."""
+    test_session_maker = app.dependency_overrides[get_readonly_session_maker]()
+    sessions = []
 
+    def session_maker() -> AsyncSession:
+        session = test_session_maker()
+        sessions.append(session)
+        return session
 
-@pytest.mark.asyncio
-async def test_read_group_not_found(client: AsyncClient):
-    """Test handling of non-existent group ID."""
-    non_existent_id = 9999
-    response = client.get(f"/api/v1/groups/{non_existent_id}")
+    response = await read_group_sites(group_id=sample_groups[0].id, session_maker=session_maker)
+    [session] = sessions
+    assert session.in_transaction()
 
-    assert response.status_code == 404
+    await response.background()
+    assert not session.in_transaction()
 
 
 # ---- create group ----
 
 
-@pytest.mark.asyncio
-async def test_create_group_success(client: AsyncClient):
+async def test_create_group_success(client: AsyncClient, faker: Faker):
     """Test new group creation success."""
     group_data = {
         "name": "Group Test",
-        "type": fake.random_element(
+        "type": faker.random_element(
             elements=(GroupType.GROUP1.value, GroupType.GROUP2.value, GroupType.GROUP3.value)
         ),
     }
 
-    response = client.post("/api/v1/groups/", json=group_data)
+    response = await client.post("/api/v1/groups/", json=group_data)
 
     assert response.status_code == 201
 
@@ -148,17 +120,16 @@ async def test_create_group_success(client: AsyncClient):
     assert "id" in created_group
 
 
-@pytest.mark.asyncio
-async def test_create_group_invalid_data(client: AsyncClient):
+async def test_create_group_invalid_data(client: AsyncClient, faker: Faker):
     """Test new group creation failing."""
     # test with missing "name" field data
     invalid_data = {
-        "type": fake.random_element(
+        "type": faker.random_element(
             elements=(GroupType.GROUP1.value, GroupType.GROUP2.value, GroupType.GROUP3.value)
         )
     }
 
-    response = client.post("/api/v1/groups/", json=invalid_data)
+    response = await client.post("/api/v1/groups/", json=invalid_data)
 
     assert response.status_code == 422
     error_data = response.json()
@@ -166,60 +137,123 @@ async def test_create_group_invalid_data(client: AsyncClient):
     assert any("name" in error["loc"] for error in error_data["detail"])
 
 
-# # ---- update group ---- TODO
+# ---- update group ----
+
+
+async def test_update_group(client: AsyncClient, sample_groups: list[Group]):
+    """Test updating a group."""
+    sample_group = sample_groups[0]
+
+    response = await client.patch(
+        f"/api/v1/groups/{sample_group.id}", json={"name": "Updated Group Name"}
+    )
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["id"] == sample_group.id
+    assert result["name"] == "Updated Group Name"
+    assert result["type"] == sample_group.type.value
+
+    response = await client.get(f"/api/v1/groups/{sample_group.id}")
+    assert response.json()["name"] == "Updated Group Name"
+
+
+async def test_update_group_not_found(client: AsyncClient):
+    """Test updating a non-existent group."""
+    response = await client.patch("/api/v1/groups/99999", json={"name": "Updated Group Name"})
+
+    assert response.status_code == 404
+
+
+# ---- group hierarchy ----
+
 
-# @pytest.mark.asyncio
-# async def test_update_group(client: AsyncClient, sample_groups: list[Group]):
-#     """Test updating a group."""
-#     sample_group = sample_groups[0]
+async def test_add_child_to_group(client: AsyncClient, sample_groups: list[Group]):
+    """Test adding a child group to a parent group."""
+    parent, child = sample_groups[0], sample_groups[1]
 
-#     update_data = {
-#         "name": "Updated Group Name"
-#     }
+    response = await client.post(f"/api/v1/groups/{parent.id}/children/{child.id}")
+    assert response.status_code == 204
 
-#     response = client.patch(f"/api/v1/groups/{sample_group.id}", json=update_data)
+    response = await client.get(f"/api/v1/groups/{parent.id}/children")
+    assert [group["id"] for group in response.json()] == [child.id]
 
-#     assert response.status_code == 200
-#     result = response.json()
-#     assert result["id"] == sample_group.id
-#     assert result["name"] == "Updated Group Name"
-#     assert result["type"] == sample_group.type
+
+async def test_add_child_to_group_cycle(client: AsyncClient, sample_groups: list[Group]):
+    """Test rejecting a child group which is already an ancestor of its parent."""
+    grandparent, parent, child = sample_groups
+
+    for ancestor, descendant in ((grandparent, parent), (parent, child)):
+        response = await client.post(f"/api/v1/groups/{ancestor.id}/children/{descendant.id}")
+        assert response.status_code == 204
+
+    response = await client.post(f"/api/v1/groups/{child.id}/children/{grandparent.id}")
+    assert response.status_code == 422
+
+
+async def test_add_child_to_group_existing_cycle(
+    client: AsyncClient, db: AsyncSession, sample_groups: list[Group]
+):
+    """Test that the ancestors lookup ends on a hierarchy which already contains a cycle."""
+    first, second, other = sample_groups
+    await db.execute(update(Group).where(Group.id == first.id).values(parent_id=second.id))
+    await db.execute(update(Group).where(Group.id == second.id).values(parent_id=first.id))
+    await db.commit()
+
+    response = await client.post(f"/api/v1/groups/{first.id}/children/{other.id}")
+    assert response.status_code == 204
+
+    response = await client.post(f"/api/v1/groups/{other.id}/children/{second.id}")
+    assert response.status_code == 422
+
+
+async def test_update_group_parent_cycle(client: AsyncClient, sample_groups: list[Group]):
+    """Test rejecting an update whose parent would introduce a cycle."""
+    parent, child = sample_groups[0], sample_groups[1]
+
+    response = await client.post(f"/api/v1/groups/{parent.id}/children/{child.id}")
+    assert response.status_code == 204
+
+    response = await client.patch(
+        f"/api/v1/groups/{parent.id}", json={"name": parent.name, "parent_id": child.id}
+    )
+    assert response.status_code == 422
+
+    response = await client.patch(
+        f"/api/v1/groups/{parent.id}", json={"name": parent.name, "parent_id": parent.id}
+    )
+    assert response.status_code == 422
 
 
 # ---- delete group ----
 
 
-@pytest.mark.asyncio
 async def test_delete_group(client: AsyncClient):
     """Test deleting a group with a temporary group created for the test."""
     group_data = {"name": "Temporary Group For Deletion", "type": GroupType.GROUP1.value}
 
-    creation_response = client.post("/api/v1/groups/", json=group_data)
+    creation_response = await client.post("/api/v1/groups/", json=group_data)
 
     assert creation_response.status_code == 201
 
     created_group = creation_response.json()
     group_id = created_group["id"]
+    assert created_group["name"] == group_data["name"]
 
-    group = client.get(f"/api/v1/groups/{group_id}")
-    assert group is not None
-    assert group.json()["name"] == group_data["name"]
-
-    delete_response = client.delete(f"/api/v1/groups/{group_id}")
+    delete_response = await client.delete(f"/api/v1/groups/{group_id}")
 
     assert delete_response.status_code == 200
     data = delete_response.json()
     assert "message" in data
 
-    get_response = client.get(f"/api/v1/groups/{group_id}")
+    get_response = await client.get(f"/api/v1/groups/{group_id}")
     assert get_response.status_code == 404
 
 
-@pytest.mark.asyncio
 async def test_delete_group_not_found(client: AsyncClient):
     """Test deleting a non-existent group."""
     non_existent_id = 99999
 
-    response = client.delete(f"/api/v1/groups/{non_existent_id}")
+    response = await client.delete(f"/api/v1/groups/{non_existent_id}")
 
     assert response.status_code == 404
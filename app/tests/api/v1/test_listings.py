@@ -0,0 +1,194 @@
+import base64
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from infrastructure.models.site import Site, SiteItaly
+from infrastructure.pagination import decode_cursor
+
+# (listing resource, fixture holding its sample rows): both listings share the same query API
+LISTINGS = pytest.mark.parametrize(
+    "resource,fixture", [("groups", "sample_groups"), ("sites", "sample_sites")]
+)
+
+
+# ---- read groups and sites ----
+@LISTINGS
+async def test_get_all(client: AsyncClient, request: pytest.FixtureRequest, resource, fixture):
+    """Test getting all groups or sites without filters."""
+    samples = request.getfixturevalue(fixture)
+
+    response = await client.get(f"/api/v1/{resource}/")
+    assert response.status_code == 200
+
+    json_data = response.json()
+    assert "data" in json_data
+    data = json_data["data"]
+
+    sample_ids = {sample.id for sample in samples}
+    response_ids = {item["id"] for item in data}
+
+    assert sample_ids.issubset(response_ids)
+
+
+@LISTINGS
+async def test_get_pagination(
+    client: AsyncClient, request: pytest.FixtureRequest, resource, fixture
+):
+    """Test cursor pagination for groups or sites."""
+    request.getfixturevalue(fixture)
+    items_per_page = 2
+
+    response = await client.get(f"/api/v1/{resource}/", params={"items_per_page": items_per_page})
+    assert response.status_code == 200
+
+    json_data = response.json()
+    assert "data" in json_data
+    assert "items_per_page" in json_data
+    assert "total_count" in json_data
+    assert "has_more" in json_data
+    assert "next_cursor" in json_data
+
+    assert len(json_data["data"]) == items_per_page
+    assert json_data["has_more"]
+    # without sort column, the cursor points at the id of the last row of the page
+    assert decode_cursor(json_data["next_cursor"], None) == (
+        None,
+        json_data["data"][-1]["id"],
+        json_data["total_count"],
+    )
+
+    response2 = await client.get(
+        f"/api/v1/{resource}/",
+        params={"cursor": json_data["next_cursor"], "items_per_page": items_per_page},
+    )
+    assert response2.status_code == 200
+
+    json_data2 = response2.json()
+    assert json_data2["total_count"] == json_data["total_count"]
+
+    first_page_ids = [item["id"] for item in json_data["data"]]
+    second_page_ids = [item["id"] for item in json_data2["data"]]
+    assert max(first_page_ids) < min(second_page_ids)
+
+
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+async def test_get_sorted_pagination(
+    client: AsyncClient, db: AsyncSession, sample_sites: list[Site], sort_order: str
+):
+    """Test following the cursors of a sorted listing, whose NULL sort values come last."""
+    db.add_all([SiteItaly(name=f"Undated Site {index}") for index in range(2)])
+    await db.commit()
+
+    rows = (await db.execute(select(Site.installation_date, Site.id))).all()
+    descending = sort_order == "desc"
+    dated = sorted((row for row in rows if row.installation_date is not None), reverse=descending)
+    undated = sorted((row for row in rows if row.installation_date is None), reverse=descending)
+    expected_ids = [row.id for row in [*dated, *undated]]
+
+    # a single site per page, so that cursors also point at sites without installation date
+    params = {"sort_by": "installation_date", "sort_order": sort_order, "items_per_page": 1}
+    ids = []
+    while True:
+        response = await client.get("/api/v1/sites/", params=params)
+        assert response.status_code == 200
+
+        json_data = response.json()
+        assert json_data["total_count"] == len(rows)
+        ids.extend(item["id"] for item in json_data["data"])
+        if not json_data["has_more"]:
+            break
+        params["cursor"] = json_data["next_cursor"]
+
+    assert ids == expected_ids
+
+
+@LISTINGS
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not-a-cursor",
+        base64.urlsafe_b64encode(b'{"id": 1}').decode(),
+        base64.urlsafe_b64encode(b"[null, 1, -1]").decode(),
+    ],
+    ids=["not-base64", "not-a-position", "negative-count"],
+)
+async def test_get_invalid_cursor(
+    client: AsyncClient, request: pytest.FixtureRequest, resource, fixture, cursor
+):
+    """Test that a malformed cursor is rejected."""
+    request.getfixturevalue(fixture)
+
+    response = await client.get(f"/api/v1/{resource}/", params={"cursor": cursor})
+    assert response.status_code == 422
+
+
+@LISTINGS
+async def test_get_page_past_the_end(
+    client: AsyncClient, request: pytest.FixtureRequest, resource, fixture
+):
+    """Test that a page past the last one is empty but still reports the total count."""
+    request.getfixturevalue(fixture)
+
+    response = await client.get(f"/api/v1/{resource}/", params={"items_per_page": 100})
+    total_count = response.json()["total_count"]
+
+    response = await client.get(f"/api/v1/{resource}/", params={"page": 100, "items_per_page": 2})
+    assert response.status_code == 200
+
+    json_data = response.json()
+    assert json_data["data"] == []
+    assert json_data["total_count"] == total_count
+    assert not json_data["has_more"]
+
+
+@LISTINGS
+async def test_get_filter_by_name(
+    client: AsyncClient, request: pytest.FixtureRequest, resource, fixture
+):
+    """Test filtering groups or sites by name."""
+    sample_name = request.getfixturevalue(fixture)[0].name
+
+    response = await client.get(f"/api/v1/{resource}/", params={"name": sample_name})
+    assert response.status_code == 200
+
+    json_data = response.json()
+    assert "data" in json_data
+    data = json_data["data"]
+    assert len(data) > 0
+
+    for item in data:
+        assert sample_name.lower() in item["name"].lower()
+
+
+@LISTINGS
+async def test_get_sorting(client: AsyncClient, request: pytest.FixtureRequest, resource, fixture):
+    """Test sorting groups or sites by name."""
+    request.getfixturevalue(fixture)
+
+    response = await client.get(
+        f"/api/v1/{resource}/", params={"sort_by": "name", "sort_order": "asc"}
+    )
+    assert response.status_code == 200
+
+    json_data = response.json()
+    assert "data" in json_data
+    data = json_data["data"]
+
+    if len(data) < 2:
+        pytest.skip(f"Not enough {resource} for sorting test")
+
+    names = [item["name"] for item in data]
+    assert names == sorted(names)
+
+    response = await client.get(
+        f"/api/v1/{resource}/", params={"sort_by": "name", "sort_order": "desc"}
+    )
+    assert response.status_code == 200
+
+    json_data = response.json()
+    data = json_data["data"]
+    names = [item["name"] for item in data]
+    assert names == sorted(names, reverse=True)
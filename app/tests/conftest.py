@@ -1,70 +1,180 @@
 import os
 import asyncio
-from typing import Any
-from collections.abc import AsyncGenerator, Generator
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass
 from datetime import date, timedelta
 
 import pytest
 import pytest_asyncio
 from faker import Faker
-from fastapi.testclient import TestClient
-from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy import select
-from sqlalchemy.orm import with_polymorphic
-
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from config import get_settings
 from main import app
+from infrastructure.cache import cache
 from infrastructure.models.site import Site, SiteFrance, SiteItaly, SiteCountry
 from infrastructure.models.group import Group, GroupType
-from infrastructure.db import Base
-
-
-@pytest.fixture(scope="session")
-def event_loop():
-    """Create an instance of the default event loop for each test case."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
+from infrastructure.db import Base, get_readonly_session, get_readonly_session_maker, get_session
 
 
 POSTGRES_USER = os.environ.get("POSTGRES_USER", "postgres")
 POSTGRES_PASSWORD = os.environ.get("POSTGRES_PASSWORD", "password")
 POSTGRES_DB = os.environ.get("POSTGRES_DB", "postgres")
+# under pytest-xdist (`pytest -n auto`), each worker runs against its own clone of a template
+# database, whose schema is created once by the controller process
+XDIST_WORKER = os.environ.get("PYTEST_XDIST_WORKER")
+TEMPLATE_DB = f"{POSTGRES_DB}_template"
+TEST_DB = f"{POSTGRES_DB}_{XDIST_WORKER}" if XDIST_WORKER else POSTGRES_DB
+
+
+def database_url(name: str) -> str:
+    return f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@db/{name}"
 
-TEST_DB_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@db/{POSTGRES_DB}"
 
-async_engine = create_async_engine(TEST_DB_URL)
-AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+ADMIN_DB_URL = database_url(POSTGRES_DB)
+TEST_DB_URL = database_url(TEST_DB)
+
+# keep cached responses in the test process: `CACHE_URL` may point at the Redis instance of the
+# running app, which `clear_cache` would flush, and which xdist workers would otherwise share
+cache.setup("mem://")
+
 
 fake = Faker()
+# sample data is generated once per session; a fixed seed makes it the same on every run
+fake.seed_instance(0)
 
 
-@pytest.fixture(scope="session")
-def client() -> Generator[TestClient, Any, None]:
-    with TestClient(app) as _client:
-        yield _client
-    app.dependency_overrides = {}
+@dataclass
+class SampleData:
+    """Rows inserted once per test session, see `sample_data`."""
 
+    french_sites: list[SiteFrance]
+    italian_sites: list[SiteItaly]
+    groups: list[Group]
 
-@pytest_asyncio.fixture
-async def async_client() -> AsyncGenerator[AsyncClient, None]:
-    async with AsyncClient(base_url="http://test") as client:
-        from httpx import ASGITransport
 
-        client.transport = ASGITransport(app=app)
-        yield client
+@pytest_asyncio.fixture(scope="session")
+async def client() -> AsyncGenerator[AsyncClient, None]:
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as _client:
+        yield _client
+
+
+async def execute_admin(*statements: str) -> None:
+    """Run database-level statements (which can't run in a transaction) on the admin database."""
+    admin_engine = create_async_engine(ADMIN_DB_URL, isolation_level="AUTOCOMMIT")
+    async with admin_engine.connect() as conn:
+        for statement in statements:
+            await conn.execute(text(statement))
+    await admin_engine.dispose()
 
 
-@pytest_asyncio.fixture
-async def db() -> AsyncGenerator[AsyncSession, None]:
-    """Create a fresh database session for each test."""
-    async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
+async def create_template_database() -> None:
+    """Create the template database cloned by the xdist workers, with the whole schema."""
+    await execute_admin(
+        f'DROP DATABASE IF EXISTS "{TEMPLATE_DB}"', f'CREATE DATABASE "{TEMPLATE_DB}"'
+    )
+    engine = create_async_engine(database_url(TEMPLATE_DB))
+    async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    if not hasattr(config, "workerinput") and config.getoption("numprocesses", None):
+        asyncio.run(create_template_database())
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    if not hasattr(config, "workerinput") and config.getoption("numprocesses", None):
+        asyncio.run(execute_admin(f'DROP DATABASE IF EXISTS "{TEMPLATE_DB}"'))
+
+
+@pytest_asyncio.fixture(scope="session")
+async def async_engine() -> AsyncGenerator[AsyncEngine, None]:
+    """
+    Create the test database engine and schema once for the whole session.
+    Test data is disposable, so commits don't wait for the WAL to be flushed.
+    """
+    if XDIST_WORKER:
+        # the clone is a file copy of the template, so it comes with the schema
+        await execute_admin(
+            f'DROP DATABASE IF EXISTS "{TEST_DB}"',
+            f'CREATE DATABASE "{TEST_DB}" TEMPLATE "{TEMPLATE_DB}"',
+        )
+
+    statement_cache_size = get_settings().db_statement_cache_size
+    engine = create_async_engine(
+        TEST_DB_URL,
+        connect_args={
+            "prepared_statement_cache_size": statement_cache_size,
+            "statement_cache_size": statement_cache_size,
+            "server_settings": {"synchronous_commit": "off"},
+        },
+    )
+    if not XDIST_WORKER:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    yield engine
+    await engine.dispose()
+    if XDIST_WORKER:
+        await execute_admin(f'DROP DATABASE "{TEST_DB}"')
 
-    async with AsyncSessionLocal() as session:
+
+@pytest.fixture(scope="session")
+def session_maker(async_engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def clear_cache() -> None:
+    """Drop cached responses so each test reads what it wrote to the database."""
+    await cache.clear()
+
+
+@pytest_asyncio.fixture(scope="session")
+async def connection(
+    async_engine: AsyncEngine, sample_data: SampleData
+) -> AsyncGenerator[AsyncConnection, None]:
+    """Connection shared by all tests, in a transaction that is never committed."""
+    async with async_engine.connect() as conn:
+        await conn.begin()
+        yield conn
+        await conn.rollback()
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def db(connection: AsyncConnection) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Run each test in a savepoint of the shared connection, rolled back at teardown.
+    The app gets its sessions on the same connection, where commits only release a nested savepoint.
+    """
+    savepoint = await connection.begin_nested()
+    test_session_maker = async_sessionmaker(
+        connection, expire_on_commit=False, join_transaction_mode="create_savepoint"
+    )
+    async with test_session_maker() as session:
+
+        async def get_test_session() -> AsyncGenerator[AsyncSession, None]:
+            async with test_session_maker() as app_session:
+                yield app_session
+
+        app.dependency_overrides[get_session] = get_test_session
+        app.dependency_overrides[get_readonly_session] = get_test_session
+        app.dependency_overrides[get_readonly_session_maker] = lambda: test_session_maker
         yield session
-        await session.rollback()
+
+    app.dependency_overrides = {}
+    await savepoint.rollback()
 
 
 def generate_site_france_data(index: int) -> dict:
@@ -119,54 +229,47 @@ def generate_group_data(index: int) -> dict:
     }
 
 
-@pytest_asyncio.fixture
-async def sample_sites(db: AsyncSession) -> list[Site]:
-    """Create sample sites (both French and Italian) for testing."""
-    # Create 3 French sites
-    french_sites = [SiteFrance(**generate_site_france_data(index=index)) for index in range(3)]
-    db.add_all(french_sites)
-    # await db.commit()
-
-    # Create 3 Italian sites
-    italian_sites = [SiteItaly(**generate_site_italy_data(index=index)) for index in range(3)]
-    db.add_all(italian_sites)
-    await db.commit()
-
-    polymorphicSite = with_polymorphic(Site, [SiteFrance, SiteItaly])
-    result = await db.execute(select(polymorphicSite))
-    sites = list(result.scalars().all())
-
-    return sites
+@pytest_asyncio.fixture(scope="session")
+async def sample_data(session_maker: async_sessionmaker[AsyncSession]) -> SampleData:
+    """
+    Insert the sample sites and groups once for the whole session.
+    Each kind of row is inserted concurrently, on its own session and pooled connection.
+    Tests run in a transaction that is rolled back, so they all see these rows unchanged.
+    """
+    data = SampleData(
+        french_sites=[SiteFrance(**generate_site_france_data(index)) for index in range(3)],
+        italian_sites=[SiteItaly(**generate_site_italy_data(index)) for index in range(3)],
+        groups=[Group(**generate_group_data(index)) for index in range(3)],
+    )
 
+    async def insert(instances: list) -> None:
+        async with session_maker() as session:
+            session.add_all(instances)
+            await session.commit()
 
-@pytest_asyncio.fixture
-async def sample_french_sites(db: AsyncSession) -> list[SiteFrance]:
-    """Create sample French sites for testing."""
-    french_sites = [SiteFrance(**generate_site_france_data(index)) for index in range(3)]
-    db.add_all(french_sites)
-    await db.commit()
+    await asyncio.gather(insert(data.french_sites), insert(data.italian_sites), insert(data.groups))
+    return data
 
-    for site in french_sites:
-        await db.refresh(site)
 
-    return french_sites
+@pytest.fixture
+def sample_sites(sample_data: SampleData) -> list[Site]:
+    """Sample sites (both French and Italian) for testing."""
+    return [*sample_data.french_sites, *sample_data.italian_sites]
 
 
-@pytest_asyncio.fixture
-async def sample_italian_sites(db: AsyncSession) -> list[SiteItaly]:
-    """Create sample Italian sites for testing."""
-    italian_sites = [SiteItaly(**generate_site_italy_data(index)) for index in range(3)]
-    db.add_all(italian_sites)
+@pytest.fixture
+def sample_french_sites(sample_data: SampleData) -> list[SiteFrance]:
+    """Sample French sites for testing."""
+    return sample_data.french_sites
 
 
-@pytest_asyncio.fixture
-async def sample_groups(db: AsyncSession) -> list[Group]:
-    """Create sample groups for testing."""
-    groups = [Group(**generate_group_data(index)) for index in range(3)]
-    db.add_all(groups)
-    await db.commit()
+@pytest.fixture
+def sample_italian_sites(sample_data: SampleData) -> list[SiteItaly]:
+    """Sample Italian sites for testing."""
+    return sample_data.italian_sites
 
-    for group in groups:
-        await db.refresh(group)
 
-    return groups
+@pytest.fixture
+def sample_groups(sample_data: SampleData) -> list[Group]:
+    """Sample groups for testing."""
+    return sample_data.groups
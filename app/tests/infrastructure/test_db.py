@@ -0,0 +1,16 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from infrastructure.db import readonly_session_maker
+
+
+# the API tests override the read-only sessions with the test sessions, so the session maker of
+# the app is checked on its own
+async def test_readonly_session_maker():
+    """Test that the transactions of read-only sessions are started as `READ ONLY`."""
+    async with readonly_session_maker() as session:
+        assert await session.scalar(text("SHOW transaction_read_only")) == "on"
+
+        with pytest.raises(DBAPIError, match="read-only transaction"):
+            await session.execute(text("CREATE TABLE read_only_check (id integer)"))